@@ -0,0 +1,49 @@
+"""
+Measures the startup time of ``python -c "import lasso.models"``.
+
+Usage: python benchmarks/startup.py [--runs N] [--module MODULE]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+
+
+def measure(module: str, runs: int):
+    """
+    Runs a fresh interpreter that imports the given module and returns the wall clock time of each run.
+
+    :param module: Module to be imported
+    :param runs: Number of runs
+    :return: List of timings in seconds
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([SRC] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], env=env, check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--module", default="lasso.models")
+    args = parser.parse_args()
+    # Baseline interpreter startup so the import cost can be read off directly
+    baseline = measure("sys", args.runs)
+    timings = measure(args.module, args.runs)
+    print(f"python -c \"import {args.module}\" ({args.runs} runs)")
+    print(f"  median: {statistics.median(timings) * 1000:.1f} ms")
+    print(f"  min:    {min(timings) * 1000:.1f} ms")
+    print(f"  import overhead (median): {(statistics.median(timings) - statistics.median(baseline)) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1 @@
-from .dtmc import DTMC
\ No newline at end of file
+from .dtmc import DTMC, CompiledDTMC
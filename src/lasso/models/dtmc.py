@@ -1,7 +1,10 @@
-from typing import Union
+from typing import Union, TextIO
 
 import numpy as np
-from graphviz import Digraph
+
+
+def _dot_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace('"', '\\"')
 
 
 class State:
@@ -50,14 +53,34 @@ class Transition:
         return f"Transition({self.s1, self.s2, self.p})"
 
 
+class CompiledDTMC:
+    """Frozen, validated transition structure of a DTMC that is reused by the analyses"""
+
+    def __init__(self, states: tuple, transition_matrix: np.ndarray, duplicates: str, atol: float):
+        self.states = states
+        self.transition_matrix = transition_matrix
+        self.transition_matrix.flags.writeable = False
+        self.duplicates = duplicates
+        self.atol = atol
+
+    def __repr__(self):
+        return f"CompiledDTMC(states={len(self.states)}, duplicates={self.duplicates}, atol={self.atol})"
+
+
 class DTMC:
     """Discrete-Time Markov Chain implementation"""
 
+    DUPLICATE_POLICIES = ("sum", "last", "error")
+
     def __init__(self):
         self.states = set()
         self.transitions = set()
         self._counter = 0
+        self._edges = []
+        self._compiled = None
         self.transition_matrix = None
+        # Incremented on every modification, identifies the model for caching
+        self.version = 0
 
     def add_state(self, name=None, ap=None):
         """
@@ -72,6 +95,8 @@ class DTMC:
         s = State(self._counter, name=name, ap=ap)
         self._counter += 1
         self.states.add(s)
+        self._compiled = None
+        self.version += 1
         return s
 
     def add_transition(self, s1: State, s2: State, p: [float, int]):
@@ -85,19 +110,132 @@ class DTMC:
         """
         t = Transition(s1, s2, p)
         self.transitions.add(t)
+        self._edges.append((s1.id, s2.id, p))
+        self._compiled = None
+        self.version += 1
         return t
 
-    def compute_transition_matrix(self):
+    def snapshot(self):
+        """
+        Returns a copy of the DTMC that is not affected by later add_state and add_transition calls. States and the
+        compiled model are shared, only the containers are copied.
+
+        :return: DTMC
+        """
+        dtmc = DTMC()
+        dtmc.states = set(self.states)
+        dtmc.transitions = set(self.transitions)
+        dtmc._counter = self._counter
+        dtmc._edges = list(self._edges)
+        dtmc._compiled = self._compiled
+        dtmc.transition_matrix = self.transition_matrix
+        dtmc.version = self.version
+        return dtmc
+
+    def _states_by_id(self):
+        return tuple(sorted(self.states, key=lambda s: s.id))
+
+    def _edge_table(self, duplicates: str):
+        """
+        Builds the edge table in bulk, resolving edges with the same source and target according to the given policy.
+
+        :param duplicates: One of "sum", "last" or "error"
+        :return: Tuple of source indices, target indices and probabilities, sorted by source and target
+        """
+        if duplicates not in self.DUPLICATE_POLICIES:
+            raise ValueError(f"Duplicate policy has to be one of {', '.join(self.DUPLICATE_POLICIES)}")
+        n = len(self.states)
+        edges = np.array(self._edges, dtype=float).reshape(-1, 3)
+        src, dst, p = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2]
+        if n == 0:
+            return src, dst, p
+        flat = src * n + dst
+        if duplicates == "sum":
+            flat, inverse = np.unique(flat, return_inverse=True)
+            p = np.bincount(inverse.ravel(), weights=p, minlength=len(flat))
+        elif duplicates == "last":
+            # First occurrence in the reversed edge table is the last added edge
+            flat, idx = np.unique(flat[::-1], return_index=True)
+            p = p[::-1][idx]
+        else:
+            flat, idx, counts = np.unique(flat, return_index=True, return_counts=True)
+            if np.any(counts > 1):
+                states = self._states_by_id()
+                dups = ", ".join(f"{states[i // n]} -> {states[i % n]}" for i in flat[counts > 1])
+                raise ValueError(f"Duplicate transitions: {dups}")
+            p = p[idx]
+        return flat // n, flat % n, p
+
+    def _build_matrix(self, duplicates: str):
+        """
+        Builds the transition matrix from the edge table.
+
+        :param duplicates: One of "sum", "last" or "error"
+        :return: Tuple of transition matrix, source indices and probabilities of the edge table
         """
-        Computes and updates the transition matrix
+        src, dst, p = self._edge_table(duplicates)
+        matrix = np.zeros((len(self.states), len(self.states)))
+        matrix[src, dst] = p
+        return matrix, src, p
 
+    def compile(self, duplicates: str = "last", atol: float = 1e-9) -> CompiledDTMC:
+        """
+        Compiles the DTMC into a frozen transition matrix and validates it, i.e. every probability lies in [0, 1],
+        every state has an outgoing transition and every row sums up to 1 (up to atol). The result is cached until
+        the DTMC is modified.
+
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error"
+        :param atol: Absolute tolerance of the row sum check
+        :return: Compiled DTMC
+        """
+        compiled = self._compiled
+        if compiled is not None and compiled.duplicates == duplicates and compiled.atol == atol:
+            return compiled
+        matrix, src, p = self._build_matrix(duplicates)
+        states = self._states_by_id()
+        if np.any((p < 0) | (p > 1 + atol)):
+            raise ValueError("Transition probabilities have to lie in [0, 1]")
+        deadlocks = np.flatnonzero(np.bincount(src, minlength=len(states)) == 0)
+        if deadlocks.size:
+            raise ValueError(f"Deadlock states: {', '.join(str(states[i]) for i in deadlocks)}")
+        row_sums = matrix.sum(axis=1)
+        invalid = np.flatnonzero(~np.isclose(row_sums, 1.0, rtol=0.0, atol=atol))
+        if invalid.size:
+            rows = ", ".join(f"{states[i]} ({row_sums[i]})" for i in invalid)
+            raise ValueError(f"Outgoing probabilities do not sum up to 1: {rows}")
+        self._compiled = CompiledDTMC(states, matrix, duplicates, atol)
+        return self._compiled
+
+    def _compiled_model(self) -> CompiledDTMC:
+        """
+        Returns the compiled model the analyses use, i.e. the result of the last compile call, or a model compiled
+        with the default policy and tolerance if the DTMC has not been compiled since its last modification.
+        The transition matrix attribute is updated to the matrix of the compiled model.
+
+        :return: Compiled DTMC
+        """
+        compiled = self._compiled if self._compiled is not None else self.compile()
+        self.transition_matrix = compiled.transition_matrix
+        return compiled
+
+    def compute_transition_matrix(self, duplicates: str = "last"):
+        """
+        Computes and updates the transition matrix. In contrast to compile, the matrix is not validated.
+
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error"
         :return: transition_matrix
         """
-        self.transition_matrix = np.zeros((len(self.states), len(self.states)))
-        for t in self.transitions:
-            self.transition_matrix[t.s1.id][t.s2.id] = t.p
+        self.transition_matrix, _, _ = self._build_matrix(duplicates)
         return self.transition_matrix
 
+    def _distribution(self, init: [np.ndarray, dict]):
+        if isinstance(init, dict):
+            init_dict = init
+            init = np.zeros(len(self.states))
+            for k, v in init_dict.items():
+                init[k.id] = v
+        return np.asarray(init, dtype=float)
+
     def transient(self, steps, init: [np.ndarray, dict]):
         """
         Computes the transient distribution for a given time step and initial distribution.
@@ -106,13 +244,8 @@ class DTMC:
         :param init: Initial distribution, either an np.ndarray or dictionary that maps states to probabilities
         :return: Transient distribution
         """
-        if isinstance(init, dict):
-            init_dict = init
-            init = np.zeros(len(self.states))
-            for k, v in init_dict.items():
-                init[k.id] = v
-        self.compute_transition_matrix()
-        transition_mat = np.linalg.matrix_power(self.transition_matrix, steps)
+        init = self._distribution(init)
+        transition_mat = np.linalg.matrix_power(self._compiled_model().transition_matrix, steps)
         return np.matmul(init, transition_mat)
 
     def compute_reachability(self, goal_states, bad_states=set(), steps=None):
@@ -124,40 +257,247 @@ class DTMC:
         :param steps: Step bound, if not given the bound is assumed to be infinite
         :return: Reachability probability
         """
-        # Find states that can actually reach goal states
-        good_states = set()
-        size = -1
-        while len(good_states) != size:
-            size = len(good_states)
-            for s in [s for s in self.states if s not in goal_states]:
-                for t in self.transitions:
-                    if s == t.s1 and (t.s2 in good_states or t.s2 in goal_states):
-                        good_states.add(s)
-        bad_states = set([s for s in bad_states if s not in goal_states])
-        good_states -= set(bad_states)
-        good_states = list(good_states)
-        bad_states = list(bad_states)
-        goal_states = list(goal_states)
-        self.compute_transition_matrix()
-        P = self.transition_matrix
-        A = P[[s.id for s in good_states], :][:, [s.id for s in good_states]]
-        b = np.sum(P[[s.id for s in good_states], :][:, [s.id for s in goal_states]], axis=1)
+        P = self._compiled_model().transition_matrix
+        n = len(self.states)
+        goal = np.zeros(n, dtype=bool)
+        goal[[s.id for s in goal_states]] = True
+        bad = np.zeros(n, dtype=bool)
+        bad[[s.id for s in bad_states]] = True
+        bad &= ~goal
+        # Find states that can actually reach goal states without visiting bad states, on the compiled graph
+        src, dst = np.nonzero(P)
+        reach = goal.copy()
+        while True:
+            new = reach.copy()
+            new[src[reach[dst]]] = True
+            new &= ~bad
+            new |= goal
+            if np.array_equal(new, reach):
+                break
+            reach = new
+        good = np.flatnonzero(reach & ~goal)
+        A = P[good, :][:, good]
+        b = np.sum(P[good, :][:, goal], axis=1)
         if steps:
             # Bounded reachability
-            x = np.zeros((len(good_states),1))
+            x = np.zeros(len(good))
             for i in range(steps):
                 x = np.matmul(A, x) + b
         else:
             # Unbounded reachability
             A = np.identity(A.shape[0]) - A
             x = np.linalg.solve(A, b)
-        val = np.zeros(len(self.states))
-        val[[s.id for s in goal_states]] = 1.0
-        val[[s.id for s in bad_states]] = 0.0
-        val[[s.id for s in good_states]] = x
+        val = np.zeros(n)
+        val[goal] = 1.0
+        val[good] = x
         return val
 
+    def _policy(self, duplicates: str = None) -> str:
+        if duplicates is not None:
+            return duplicates
+        return self._compiled.duplicates if self._compiled is not None else "last"
+
+    def _graph(self, duplicates: str = None):
+        """
+        Builds the edge table and removes transitions with probability 0, i.e. the edges of the underlying graph.
+
+        :param duplicates: One of "sum", "last" or "error", the policy of the compiled model if not given
+        :return: Tuple of source indices, target indices and probabilities, sorted by source and target
+        """
+        src, dst, p = self._edge_table(self._policy(duplicates))
+        positive = p > 0
+        return src[positive], dst[positive], p[positive]
+
+    def _scc_decomposition(self, src: np.ndarray, dst: np.ndarray):
+        """
+        Computes the strongly connected components with an iterative version of Tarjan's algorithm on the graph.
+
+        :param src: Source indices of the graph, sorted
+        :param dst: Target indices of the graph
+        :return: Tuple of the component index of every state id and the list of components (lists of state ids)
+        """
+        n = len(self.states)
+        # Edge table is sorted by source, hence the successors of v are succ[indptr[v]:indptr[v + 1]]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n)))).tolist()
+        succ = dst.tolist()
+        index, low, on_stack, comp = [-1] * n, [0] * n, [False] * n, [-1] * n
+        stack, sccs, counter = [], [], 0
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, indptr[root])]
+            while work:
+                v, i = work[-1]
+                if i < indptr[v + 1]:
+                    work[-1] = (v, i + 1)
+                    w = succ[i]
+                    if index[w] == -1:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, indptr[w]))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        comp[w] = len(sccs)
+                        scc.append(w)
+                        if w == v:
+                            break
+                    sccs.append(scc)
+        return np.array(comp, dtype=np.int64), sccs
+
+    def _bottom_components(self, comp: np.ndarray, sccs: list, src: np.ndarray, dst: np.ndarray):
+        leaving = np.zeros(len(sccs), dtype=bool)
+        leaving[comp[src[comp[src] != comp[dst]]]] = True
+        return [scc for k, scc in enumerate(sccs) if not leaving[k]]
+
+    def compute_sccs(self, duplicates: str = None):
+        """
+        Computes the strongly connected components of the DTMC.
+
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error".
+            If not given, the policy of the last compiled model is used, or "last" if the DTMC has not been compiled
+        :return: List of sets of states
+        """
+        states = self._states_by_id()
+        src, dst, _ = self._graph(duplicates)
+        _, sccs = self._scc_decomposition(src, dst)
+        return [set(states[i] for i in scc) for scc in sccs]
+
+    def compute_bsccs(self, duplicates: str = None):
+        """
+        Computes the bottom strongly connected components of the DTMC, i.e. SCCs that cannot be left.
+
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error".
+            If not given, the policy of the last compiled model is used, or "last" if the DTMC has not been compiled
+        :return: List of sets of states
+        """
+        states = self._states_by_id()
+        src, dst, _ = self._graph(duplicates)
+        comp, sccs = self._scc_decomposition(src, dst)
+        return [set(states[i] for i in scc) for scc in self._bottom_components(comp, sccs, src, dst)]
+
+    def neighborhood(self, states, hops: int, direction: str = "both", duplicates: str = None):
+        """
+        Computes the states that are at most hops transitions away from the given states.
+
+        :param states: Center states
+        :param hops: Number of transitions
+        :param direction: Follow outgoing ("out"), incoming ("in") or both ("both") transitions
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error".
+            If not given, the policy of the last compiled model is used, or "last" if the DTMC has not been compiled
+        :return: Set of states
+        """
+        if direction not in ("out", "in", "both"):
+            raise ValueError("Direction has to be one of out, in, both")
+        by_id = self._states_by_id()
+        src, dst, _ = self._graph(duplicates)
+        mask = np.zeros(len(by_id), dtype=bool)
+        mask[[s.id for s in states]] = True
+        for _ in range(hops):
+            new = mask.copy()
+            if direction in ("out", "both"):
+                new[dst[mask[src]]] = True
+            if direction in ("in", "both"):
+                new[src[mask[dst]]] = True
+            if np.array_equal(new, mask):
+                break
+            mask = new
+        return set(by_id[i] for i in np.flatnonzero(mask))
+
+    def transient_region(self, init: [np.ndarray, dict], steps: int, top: int, duplicates: str = None):
+        """
+        Computes the top states w.r.t. max_{t <= steps} P(X_t = s), i.e. the highest probability of being in the state
+        at any single step up to the bound (not the probability of visiting it within the bound). The transient
+        distributions are propagated over the edge table, i.e. no dense matrix is built.
+
+        :param init: Initial distribution, either an np.ndarray or dictionary that maps states to probabilities
+        :param steps: Number of steps
+        :param top: Maximal number of states
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error".
+            If not given, the policy of the last compiled model is used, or "last" if the DTMC has not been compiled
+        :return: Set of states
+        """
+        by_id = self._states_by_id()
+        src, dst, p = self._edge_table(self._policy(duplicates))
+        distr = self._distribution(init)
+        score = distr.copy()
+        for _ in range(steps):
+            distr = np.bincount(dst, weights=distr[src] * p, minlength=len(by_id))
+            np.maximum(score, distr, out=score)
+        order = np.argsort(-score, kind="stable")[:top]
+        return set(by_id[i] for i in order if score[i] > 0)
+
+    def write_dot(self, file: TextIO, states=None, clusters: str = None, duplicates: str = None):
+        """
+        Streams the DTMC in DOT format to a file object. In contrast to to_dot, neither graphviz nor the whole
+        source is held in memory.
+
+        :param file: Writable text file object
+        :param states: Restricts the output to the given states (e.g. a neighborhood or transient region), all
+            states if not given. Only transitions with positive probability between the given states are written.
+        :param clusters: Groups states into "scc" (non-trivial SCCs) or "bscc" clusters, no clusters if not given
+        :param duplicates: Policy for transitions with the same source and target, either "sum", "last" or "error".
+            If not given, the policy of the last compiled model is used, or "last" if the DTMC has not been compiled
+        """
+        if clusters not in (None, "scc", "bscc"):
+            raise ValueError("Clusters has to be one of scc, bscc")
+        by_id = self._states_by_id()
+        src, dst, p = self._graph(duplicates)
+        if states is None:
+            view = np.ones(len(by_id), dtype=bool)
+        else:
+            view = np.zeros(len(by_id), dtype=bool)
+            view[[s.id for s in states]] = True
+        # States of the view that have not been written yet
+        pending = view.copy()
+
+        def node(i, indent):
+            s = by_id[i]
+            return f'{indent}{s.id} [label="{_dot_escape(s.name)}\\n{_dot_escape(str(s.ap))}"]\n'
+
+        file.write("digraph {\n")
+        if clusters is not None:
+            comp, sccs = self._scc_decomposition(src, dst)
+            if clusters == "scc":
+                groups = [scc for scc in sccs if len(scc) > 1]
+            else:
+                groups = self._bottom_components(comp, sccs, src, dst)
+            for k, group in enumerate(groups):
+                members = sorted(i for i in group if view[i])
+                if not members:
+                    continue
+                file.write(f'\tsubgraph cluster_{k} {{\n\t\tlabel="{clusters.upper()} {k}"\n')
+                file.writelines(node(i, "\t\t") for i in members)
+                file.write("\t}\n")
+                pending[members] = False
+        file.writelines(node(i, "\t") for i in np.flatnonzero(pending))
+        keep = view[src] & view[dst]
+        file.writelines(f'\t{s1} -> {s2} [label="{p_}"]\n'
+                        for s1, s2, p_ in zip(src[keep].tolist(), dst[keep].tolist(), p[keep].tolist()))
+        file.write("}\n")
+
     def to_dot(self):
+        """
+        Returns the DOT source of the DTMC. graphviz is only imported on first use.
+
+        :return: DOT source
+        """
+        from graphviz import Digraph
         digraph = Digraph()
         for s in self.states:
             digraph.node(str(s.id), f"{s.name}\n{s.ap}")
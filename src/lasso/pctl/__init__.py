@@ -1,2 +1,12 @@
-from .parser import AP, Disjunction, Conjunction, Negation, P, BoundedUntil, Until, Next
-from .parser import parse
+from .pctl import AP, Disjunction, Conjunction, Negation, P, BoundedUntil, Until, Next
+
+
+def parse(s: str):
+    """
+    Parses a string into a PCTL formula. The parser (and lark) is only imported on first use.
+
+    :param s: String to be parsed
+    :return: PCTL state formula
+    """
+    from .parser import parse as _parse
+    return _parse(s)
@@ -19,7 +19,27 @@ range: CMP DECIMAL -> comparison | "["DECIMAL","DECIMAL"]" -> interval
 %import common.INT
 """
 
-PCTL_PARSER = lark.Lark(GRAMMAR, start="state_formula")
+_PCTL_PARSER = None
+
+
+def get_parser() -> lark.Lark:
+    """
+    Returns the PCTL parser. The grammar is compiled on first use and cached afterwards.
+
+    :return: Lark parser
+    """
+    global _PCTL_PARSER
+    if _PCTL_PARSER is None:
+        _PCTL_PARSER = lark.Lark(GRAMMAR, start="state_formula")
+    return _PCTL_PARSER
+
+
+def __getattr__(name):
+    # PCTL_PARSER used to be compiled at import time, it is still available but built on first access
+    if name == "PCTL_PARSER":
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class PCTLTransformer(lark.Transformer):
 
@@ -80,6 +100,6 @@ def parse(s: str) -> StateFormula:
     :param s: String to be parsed
     :return: PCTL state formula
     """
-    tree = PCTL_PARSER.parse(s.replace(" ", ""))
+    tree = get_parser().parse(s.replace(" ", ""))
     return PCTLTransformer.transform(tree)
 
@@ -0,0 +1 @@
+from .checker import ModelChecker
@@ -0,0 +1,136 @@
+import asyncio
+import copy
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Union
+
+from lasso.models.dtmc import DTMC
+from lasso.pctl.pctl import StateFormula, PathFormula
+
+
+def _fresh_copy(formula: StateFormula) -> StateFormula:
+    """
+    Copies a formula and clears the satisfying states cached by previous evaluations.
+
+    :param formula: PCTL state formula
+    :return: Copy of the formula
+    """
+    formula = copy.deepcopy(formula)
+    todo = [formula]
+    while todo:
+        phi = todo.pop()
+        if isinstance(phi, StateFormula):
+            phi.states = None
+        todo.extend(v for v in vars(phi).values() if isinstance(v, (StateFormula, PathFormula)))
+    return formula
+
+
+class ModelChecker:
+    """
+    Asyncio model checker for a DTMC. Formulae are evaluated in an executor, identical in-flight requests, i.e.
+    same model version and formula, are coalesced into one computation and completed results are kept in an LRU cache.
+
+    Formulae are evaluated on a snapshot of the DTMC taken on the event loop thread, hence add_state and
+    add_transition may be called while checks are in flight; results of an outdated model version are returned
+    to the waiting requests but not cached. The model version is DTMC.version, which changes with add_state and
+    add_transition. Atomic propositions that are modified through State.ap afterwards require incrementing
+    DTMC.version manually and must not be modified while checks are in flight, as states are shared with the snapshot.
+
+    If the DTMC has not been compiled, it is compiled with the defaults once per model version in the executor and
+    the compiled model is stored in the DTMC, so that all snapshots of that version share it.
+    """
+
+    def __init__(self, dtmc: DTMC, maxsize: int = 128, executor: Executor = None):
+        """
+        :param dtmc: Model to be checked
+        :param maxsize: Maximal number of cached results, the least recently used result is evicted first
+        :param executor: Executor the formulae are evaluated in, the default executor of the event loop if not given
+        """
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise ValueError("Maxsize has to be a non-negative integer")
+        self.dtmc = dtmc
+        self.maxsize = maxsize
+        self.executor = executor
+        self._cache = OrderedDict()
+        self._inflight = {}
+        # Model version and future of the compilation in flight (or completed) for that version
+        self._compiling = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def _evaluate(formula: StateFormula, dtmc: DTMC) -> frozenset:
+        return frozenset(formula.eval(dtmc))
+
+    def _compiled_done(self, version: int, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        if version == self.dtmc.version and self.dtmc._compiled is None:
+            self.dtmc._compiled = future.result()
+
+    def _compile(self, snapshot: DTMC) -> asyncio.Future:
+        """
+        Returns the future of the compilation of the given snapshot, shared by all snapshots of the same version.
+
+        :param snapshot: Snapshot of the DTMC
+        :return: Future of the compiled DTMC
+        """
+        if self._compiling is None or self._compiling[0] != snapshot.version:
+            version = snapshot.version
+            future = asyncio.get_running_loop().run_in_executor(self.executor, snapshot.compile)
+            future.add_done_callback(lambda f: self._compiled_done(version, f))
+            self._compiling = (version, future)
+        return self._compiling[1]
+
+    async def _run(self, formula: StateFormula, snapshot: DTMC) -> frozenset:
+        if snapshot._compiled is None:
+            snapshot._compiled = await asyncio.shield(self._compile(snapshot))
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._evaluate, formula, snapshot)
+
+    def _done(self, key, future: asyncio.Future):
+        del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        # Results computed while the model changed are not reliable
+        if key[0] != self.dtmc.version or self.maxsize == 0:
+            return
+        self._cache[key] = future.result()
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def check(self, formula: Union[StateFormula, str]) -> frozenset:
+        """
+        Computes the states of the DTMC satisfying the formula.
+
+        :param formula: PCTL state formula or string that is parsed
+        :return: Satisfying states
+        """
+        if isinstance(formula, str):
+            from lasso.pctl.parser import parse
+            formula = parse(formula)
+        if not isinstance(formula, StateFormula):
+            raise ValueError("Passed formula has to be state formula")
+        key = (self.dtmc.version, str(formula))
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        future = self._inflight.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(self._run(_fresh_copy(formula), self.dtmc.snapshot()))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        else:
+            self.coalesced += 1
+        # Cancelling one request must not cancel the computation shared with the others
+        return await asyncio.shield(future)
+
+    def cache_clear(self):
+        """Removes all cached results"""
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
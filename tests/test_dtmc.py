@@ -1,3 +1,4 @@
+import io
 import unittest
 import numpy as np
 
@@ -71,6 +72,180 @@ class TestDTMC(unittest.TestCase):
         v = self.dtmc.compute_reachability([s2])
         self.assertAlmostEqual(v[s1.id], 1.0)
 
+    def test_compile(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.5)
+        self.dtmc.add_transition(s1, s1, 0.5)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        compiled = self.dtmc.compile()
+        self.assertTrue(np.allclose(compiled.transition_matrix, np.array([[0.5, 0.5], [0.0, 1.0]])))
+        self.assertFalse(compiled.transition_matrix.flags.writeable)
+        self.assertIs(self.dtmc.compile(), compiled)
+        self.dtmc.add_state()
+        self.assertIsNone(self.dtmc._compiled)
+
+    def test_compile_duplicates(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.25)
+        self.dtmc.add_transition(s1, s2, 0.25)
+        self.dtmc.add_transition(s1, s1, 0.5)
+        self.dtmc.add_transition(s2, s2, 0.3)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        self.assertTrue(np.allclose(self.dtmc.compute_transition_matrix(duplicates="last"),
+                                    np.array([[0.5, 0.25], [0.0, 1.0]])))
+        self.assertTrue(np.allclose(self.dtmc.compute_transition_matrix(duplicates="sum"),
+                                    np.array([[0.5, 0.5], [0.0, 1.3]])))
+        self.assertRaisesRegex(ValueError, "sum up to 1", self.dtmc.compile, duplicates="last")
+        self.assertRaisesRegex(ValueError, "Duplicate", self.dtmc.compile, duplicates="error")
+        self.assertRaises(ValueError, self.dtmc.compile, duplicates="first")
+
+    def test_compile_duplicates_last(self):
+        s1 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s1, 0.3)
+        self.dtmc.add_transition(s1, s1, 1.0)
+        self.assertTrue(np.allclose(self.dtmc.compile().transition_matrix, np.array([[1.0]])))
+
+    def test_compile_reused_by_analyses(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.25)
+        self.dtmc.add_transition(s1, s2, 0.25)
+        self.dtmc.add_transition(s1, s1, 0.5)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        compiled = self.dtmc.compile(duplicates="sum")
+        res = self.dtmc.transient(1, {s1: 1.0})
+        self.assertTrue(np.allclose(res, np.array([0.5, 0.5])))
+        res = self.dtmc.compute_reachability([s2])
+        self.assertAlmostEqual(res[s1.id], 1.0)
+        self.assertIs(self.dtmc.compile(duplicates="sum"), compiled)
+        self.assertIs(self.dtmc.transition_matrix, compiled.transition_matrix)
+
+    def test_reachability_duplicate_zero(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.5)
+        self.dtmc.add_transition(s1, s1, 0.5)
+        self.dtmc.add_transition(s1, s2, 0.0)
+        self.dtmc.add_transition(s1, s1, 1.0)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        res = self.dtmc.compute_reachability([s2])
+        self.assertAlmostEqual(res[s1.id], 0.0)
+        self.assertAlmostEqual(res[s2.id], 1.0)
+        res = self.dtmc.compute_reachability([s2], steps=3)
+        self.assertAlmostEqual(res[s1.id], 0.0)
+
+    def test_bounded_reachability_multiple_states(self):
+        s = [self.dtmc.add_state() for _ in range(3)]
+        self.dtmc.add_transition(s[0], s[1], 1.0)
+        self.dtmc.add_transition(s[1], s[2], 0.5)
+        self.dtmc.add_transition(s[1], s[1], 0.5)
+        self.dtmc.add_transition(s[2], s[2], 1.0)
+        res = self.dtmc.compute_reachability([s[2]], steps=2)
+        self.assertTrue(np.allclose(res, np.array([0.5, 0.75, 1.0])))
+
+    def test_compile_validation(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.5)
+        self.dtmc.add_transition(s1, s1, 0.4)
+        self.assertRaisesRegex(ValueError, "Deadlock", self.dtmc.compile)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        self.assertRaisesRegex(ValueError, "sum up to 1", self.dtmc.compile)
+        self.dtmc.compile(atol=0.2)
+
+    def _two_component_chain(self):
+        s = [self.dtmc.add_state() for _ in range(5)]
+        self.dtmc.add_transition(s[0], s[1], 0.5)
+        self.dtmc.add_transition(s[0], s[2], 0.5)
+        self.dtmc.add_transition(s[1], s[0], 1.0)
+        self.dtmc.add_transition(s[2], s[3], 1.0)
+        self.dtmc.add_transition(s[3], s[4], 1.0)
+        self.dtmc.add_transition(s[4], s[3], 1.0)
+        return s
+
+    def test_snapshot(self):
+        s1 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s1, 1.0)
+        compiled = self.dtmc.compile()
+        snapshot = self.dtmc.snapshot()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s2, s2, 1.0)
+        self.assertEqual(snapshot.states, {s1})
+        self.assertEqual(len(snapshot.transitions), 1)
+        self.assertIs(snapshot.compile(), compiled)
+        self.assertNotEqual(snapshot.version, self.dtmc.version)
+
+    def test_compute_sccs(self):
+        s = self._two_component_chain()
+        sccs = self.dtmc.compute_sccs()
+        self.assertEqual(len(sccs), 3)
+        self.assertIn({s[0], s[1]}, sccs)
+        self.assertIn({s[2]}, sccs)
+        self.assertIn({s[3], s[4]}, sccs)
+        self.assertEqual(self.dtmc.compute_bsccs(), [{s[3], s[4]}])
+
+    def test_neighborhood(self):
+        s = self._two_component_chain()
+        self.assertEqual(self.dtmc.neighborhood([s[2]], 1, direction="out"), {s[2], s[3]})
+        self.assertEqual(self.dtmc.neighborhood([s[2]], 1, direction="in"), {s[0], s[2]})
+        self.assertEqual(self.dtmc.neighborhood([s[2]], 1), {s[0], s[2], s[3]})
+        self.assertEqual(self.dtmc.neighborhood([s[2]], 0), {s[2]})
+
+    def test_transient_region(self):
+        s = self._two_component_chain()
+        self.assertEqual(self.dtmc.transient_region({s[0]: 1.0}, 1, 5), {s[0], s[1], s[2]})
+        self.assertEqual(self.dtmc.transient_region({s[0]: 1.0}, 1, 1), {s[0]})
+
+    def test_duplicates_in_graph_views(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.5)
+        self.dtmc.add_transition(s1, s2, 0.0)
+        self.dtmc.add_transition(s1, s1, 1.0)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        self.assertEqual(self.dtmc.neighborhood([s1], 1, direction="out"), {s1})
+        self.assertEqual(self.dtmc.neighborhood([s1], 1, direction="out", duplicates="sum"), {s1, s2})
+        self.assertEqual(self.dtmc.compute_bsccs(), [{s1}, {s2}])
+        self.assertEqual(self.dtmc.compute_bsccs(duplicates="sum"), [{s2}])
+        file = io.StringIO()
+        self.dtmc.write_dot(file, clusters="bscc")
+        self.assertNotIn("0 -> 1", file.getvalue())
+        self.assertEqual(file.getvalue().count("subgraph cluster_"), 2)
+
+    def test_graph_views_use_compiled_policy(self):
+        s1 = self.dtmc.add_state()
+        s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(s1, s2, 0.25)
+        self.dtmc.add_transition(s1, s2, 0.0)
+        self.dtmc.add_transition(s1, s1, 0.75)
+        self.dtmc.add_transition(s2, s2, 1.0)
+        self.assertEqual(self.dtmc.neighborhood([s1], 1, direction="out"), {s1})
+        self.dtmc.compile(duplicates="sum")
+        self.assertEqual(self.dtmc.neighborhood([s1], 1, direction="out"), {s1, s2})
+        self.assertEqual(self.dtmc.compute_bsccs(), [{s2}])
+        self.assertEqual(self.dtmc.transient_region({s1: 1.0}, 1, 2), {s1, s2})
+        file = io.StringIO()
+        self.dtmc.write_dot(file)
+        self.assertIn("0 -> 1", file.getvalue())
+
+    def test_write_dot(self):
+        s = self._two_component_chain()
+        file = io.StringIO()
+        self.dtmc.write_dot(file, clusters="scc")
+        dot = file.getvalue()
+        self.assertTrue(dot.startswith("digraph {"))
+        self.assertEqual(dot.count("subgraph cluster_"), 2)
+        self.assertEqual(dot.count(" -> "), 6)
+        file = io.StringIO()
+        self.dtmc.write_dot(file, states=self.dtmc.neighborhood([s[2]], 1, direction="out"), clusters="bscc")
+        dot = file.getvalue()
+        self.assertEqual(dot.count("subgraph cluster_"), 1)
+        self.assertEqual(dot.count(" -> "), 1)
+        self.assertIn("2 -> 3", dot)
+        self.assertNotIn("\t4 ", dot)
+
 
 if __name__ == '__main__':
     unittest.main()
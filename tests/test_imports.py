@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+def loaded_modules(statement):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    code = f"import sys\n{statement}\nprint(' '.join(sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return set(out.stdout.split())
+
+
+class TestImports(unittest.TestCase):
+
+    def test_models_import_is_lazy(self):
+        modules = loaded_modules("import lasso.models")
+        self.assertNotIn("graphviz", modules)
+        self.assertNotIn("lark", modules)
+
+    def test_pctl_import_is_lazy(self):
+        modules = loaded_modules("import lasso.pctl")
+        self.assertNotIn("lark", modules)
+        self.assertNotIn("lasso.pctl.parser", modules)
+
+    def test_parse_loads_parser(self):
+        modules = loaded_modules("from lasso.pctl import parse; parse('a & b')")
+        self.assertIn("lark", modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,10 @@ class ParserTest(unittest.TestCase):
         neg = parse("!a")
         self.assertIsInstance(neg, Negation)
 
+    def test_pctl_parser(self):
+        from lasso.pctl.parser import PCTL_PARSER, get_parser
+        self.assertIs(PCTL_PARSER, get_parser())
+
 
 if __name__ == '__main__':
     unittest.main()
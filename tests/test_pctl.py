@@ -1,7 +1,7 @@
 import unittest
 
 from lasso.models.dtmc import DTMC
-from lasso.pctl import AP, Disjunction, Conjunction, BoundedUntil, P
+from lasso.pctl import AP, Disjunction, Conjunction, BoundedUntil, Until, Negation, P
 from lasso.utils import Interval
 
 
@@ -15,6 +15,7 @@ class TestPCTL(unittest.TestCase):
         self.dtmc.add_transition(self.s0, self.s1, 0.6)
         self.dtmc.add_transition(self.s0, self.s0, 0.3)
         self.dtmc.add_transition(self.s0, self.s2, 0.1)
+        self.dtmc.add_transition(self.s1, self.s1, 1.0)
         self.dtmc.add_transition(self.s2, self.s2, 1.0)
         self.dtmc.add_transition(self.s2, self.s0, 0.2)
         self.dtmc.add_transition(self.s2, self.s2, 0.8)
@@ -60,6 +61,19 @@ class TestPCTL(unittest.TestCase):
         prob = psi.compute_probability(self.s0, self.dtmc)
         self.assertAlmostEqual(prob, 0.13)
 
+    def test_duplicate_transitions(self):
+        # s2 -> s2 is added twice, the last transition (0.8) wins by default
+        a, b = self.a, self.b
+        self.s0.ap.append(a)
+        self.s1.ap.append(b)
+        self.assertRaises(ValueError, self.dtmc.compile, duplicates="error")
+        self.assertRaises(ValueError, self.dtmc.compile, duplicates="sum")
+        self.dtmc.compile(duplicates="last")
+        psi = Until(Disjunction(a, Negation(b)), b)
+        self.assertAlmostEqual(psi.compute_probability(self.s2, self.dtmc), 1.0)
+        psi = BoundedUntil(Negation(b), b, 2)
+        self.assertAlmostEqual(psi.compute_probability(self.s2, self.dtmc), 0.2 * 0.6)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from lasso.models.dtmc import DTMC
+from lasso.pctl import AP, P, BoundedUntil
+from lasso.service import ModelChecker
+from lasso.utils import Interval
+
+
+class StandInServer:
+    """Local in-process stand-in for the HTTP service, one formula per line and connection"""
+
+    def __init__(self, checker: ModelChecker):
+        self.checker = checker
+        self.server = None
+
+    async def handle(self, reader, writer):
+        formula = (await reader.readline()).decode().strip()
+        states = await self.checker.check(formula)
+        writer.write((",".join(sorted(s.name for s in states)) + "\n").encode())
+        await writer.drain()
+        writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def request(port, formula):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((formula + "\n").encode())
+    await writer.drain()
+    response = (await reader.readline()).decode().strip()
+    writer.close()
+    return response
+
+
+class TestModelChecker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.dtmc = DTMC()
+        self.s0 = self.dtmc.add_state()
+        self.s1 = self.dtmc.add_state()
+        self.s2 = self.dtmc.add_state()
+        self.dtmc.add_transition(self.s0, self.s1, 0.6)
+        self.dtmc.add_transition(self.s0, self.s0, 0.3)
+        self.dtmc.add_transition(self.s0, self.s2, 0.1)
+        self.dtmc.add_transition(self.s1, self.s1, 1.0)
+        self.dtmc.add_transition(self.s2, self.s0, 0.2)
+        self.dtmc.add_transition(self.s2, self.s2, 0.8)
+        self.s0.ap.append(AP("a"))
+        self.s2.ap.append(AP("b"))
+
+    async def test_check(self):
+        checker = ModelChecker(self.dtmc)
+        states = await checker.check(P(Interval(0.1, 1.0), BoundedUntil(AP("a"), AP("b"), 10)))
+        self.assertEqual(states, {self.s0, self.s2})
+        self.assertEqual(await checker.check("a | b"), {self.s0, self.s2})
+
+    async def test_coalescing(self):
+        checker = ModelChecker(self.dtmc)
+        results = await asyncio.gather(*[checker.check("a & b") for _ in range(5)])
+        self.assertEqual(checker.misses, 1)
+        self.assertEqual(checker.coalesced, 4)
+        self.assertTrue(all(r == results[0] for r in results))
+        await checker.check("a & b")
+        self.assertEqual(checker.hits, 1)
+
+    async def test_version(self):
+        checker = ModelChecker(self.dtmc)
+        self.assertEqual(await checker.check("b"), {self.s2})
+        s3 = self.dtmc.add_state(ap=[AP("b")])
+        self.dtmc.add_transition(s3, s3, 1.0)
+        self.assertEqual(await checker.check("b"), {self.s2, s3})
+        self.assertEqual(checker.misses, 2)
+
+    async def test_modification_in_flight(self):
+        checker = ModelChecker(self.dtmc)
+        future = asyncio.ensure_future(checker.check("P>=0.1(a U<=10 b)"))
+        await asyncio.sleep(0)
+        s3 = self.dtmc.add_state(ap=[AP("b")])
+        self.dtmc.add_transition(s3, s3, 1.0)
+        self.assertEqual(await future, {self.s0, self.s2})
+        self.assertEqual(await checker.check("P>=0.1(a U<=10 b)"), {self.s0, self.s2, s3})
+
+    async def test_compile_once_per_version(self):
+        checker = ModelChecker(self.dtmc)
+        with mock.patch.object(DTMC, "_build_matrix", autospec=True, side_effect=DTMC._build_matrix) as build:
+            await asyncio.gather(checker.check("P>=0.1(a U<=10 b)"), checker.check("P>=0.5(X b)"),
+                                 checker.check("P<=0.5(a U b)"))
+            await checker.check("P>=0.1(X a)")
+            self.assertEqual(checker.misses, 4)
+            self.assertEqual(build.call_count, 1)
+            self.assertIsNotNone(self.dtmc._compiled)
+            s3 = self.dtmc.add_state()
+            self.dtmc.add_transition(s3, s3, 1.0)
+            await checker.check("P>=0.1(X a)")
+            self.assertEqual(build.call_count, 2)
+
+    async def test_eviction(self):
+        checker = ModelChecker(self.dtmc, maxsize=2)
+        await checker.check("a")
+        await checker.check("b")
+        await checker.check("a")
+        await checker.check("!a")
+        self.assertEqual(len(checker), 2)
+        await checker.check("a")
+        self.assertEqual(checker.hits, 2)
+        await checker.check("b")
+        self.assertEqual(checker.misses, 4)
+
+    async def test_stand_in_server(self):
+        checker = ModelChecker(self.dtmc)
+        server = StandInServer(checker)
+        port = await server.start()
+        try:
+            responses = await asyncio.gather(*[request(port, "P>=0.1(a U<=10 b)") for _ in range(10)])
+        finally:
+            await server.stop()
+        self.assertEqual(set(responses), {"s0,s2"})
+        self.assertEqual(checker.misses + checker.coalesced + checker.hits, 10)
+        self.assertEqual(checker.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()